@@ -0,0 +1,85 @@
+"""
+Michael duPont - michael@mdupont.com
+Orlando Python: Beginners Series
+
+A batch version of the time of day conditional in syntax_and_data_structures.py.
+Instead of asking for one value with input(), it reads one time of day per line
+from a file or stdin and writes one response per line
+"""
+
+import io
+import sys
+from itertools import repeat
+from time import perf_counter
+from typing import TextIO
+
+#A dict lookup replaces the if/elif chain. Anything not listed gets DEFAULT
+RESPONSES = {
+    'morning': 'Top o the morning to you!',
+    'afternoon': "Awesome let's get coffee",
+}
+DEFAULT = 'This day is dragging'
+
+def respond(time_of_day: str) -> str:
+    """Returns the greeting for a single time of day"""
+    return RESPONSES.get(time_of_day, DEFAULT)
+
+def respond_all(fin: TextIO, fout: TextIO, block_size: int = 1 << 20) -> int:
+    """Write a response line for every record in fin. Returns records handled
+
+    fin is read block_size characters at a time and the responses for each
+    block are sent to fout in a single write call
+    """
+    #Keep the newline on each response so a block is just one join
+    table = {key: value + '\n' for key, value in RESPONSES.items()}
+    defaults = repeat(DEFAULT + '\n')
+    count = 0
+    leftover = ''
+    while True:
+        data = fin.read(block_size)
+        if not data:
+            break
+        lines = (leftover + data).split('\n')
+        #The last piece may be a partial line, so save it for the next block
+        leftover = lines.pop()
+        count += len(lines)
+        fout.write(''.join(map(table.get, lines, defaults)))
+    if leftover:
+        count += 1
+        fout.write(table.get(leftover, DEFAULT + '\n'))
+    return count
+
+def respond_all_naive(fin: TextIO, fout: TextIO) -> int:
+    """The original if/elif chain with one write per record, for comparison"""
+    count = 0
+    for line in fin:
+        time_of_day = line.rstrip('\n')
+        if time_of_day == 'morning':
+            fout.write('Top o the morning to you!\n')
+        elif time_of_day == 'afternoon':
+            fout.write("Awesome let's get coffee\n")
+        else:
+            fout.write('This day is dragging\n')
+        count += 1
+    return count
+
+def benchmark(records: int = 3_000_000):
+    """Print records per second for the naive loop and the batch version"""
+    values = ['morning', 'afternoon', 'evening', 'night']
+    text = ''.join(values[i % len(values)] + '\n' for i in range(records))
+    for name, func in (('naive', respond_all_naive), ('batch', respond_all)):
+        fout = io.StringIO()
+        start = perf_counter()
+        func(io.StringIO(text), fout)
+        elapsed = perf_counter() - start
+        print('{:>6}: {:_.0f} records/s ({:.3f} seconds)'.format(name, records / elapsed, elapsed))
+
+if __name__ == '__main__':
+    #Usage: greeting_batch.py [FILE | --bench]
+    if '--bench' in sys.argv:
+        benchmark()
+    elif len(sys.argv) > 1:
+        with open(sys.argv[1]) as fin:
+            respond_all(fin, sys.stdout)
+    else:
+        respond_all(sys.stdin, sys.stdout)
@@ -0,0 +1,138 @@
+"""
+Michael duPont - michael@mdupont.com
+Orlando Python: Beginners Series
+
+Scales up the pig latin example from syntax_and_data_structures.py to whole
+text files. The file is read in chunks that always end on a word boundary,
+chunks are translated across several processes, and the results are written
+back out in their original order while only a few chunks are held in memory
+"""
+
+import os
+import re
+from collections import deque
+from functools import partial
+from multiprocessing import Pool, cpu_count
+from string import ascii_letters
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+
+#A "word" is a run of letters. Everything else (spaces, punctuation) is kept
+WORD = re.compile(r'([A-Za-z]+)')
+#The longest word read_chunks will carry between chunks before giving up
+MAX_WORD = 1 << 20
+
+def pig_latin(word: str) -> str:
+    """Python --> ython-Pay"""
+    return word[1:] + '-' + word[0] + 'ay'
+
+def transform_words(text: str, func: Callable[[str], str] = pig_latin) -> Iterator[str]:
+    """Yields the pieces of text with func applied to each word"""
+    #re.split with a group keeps the words at the odd indexes
+    for i, piece in enumerate(WORD.split(text)):
+        yield func(piece) if i % 2 else piece
+
+def transform_chunk(chunk: str, func: Callable[[str], str] = pig_latin) -> str:
+    """Translate a single chunk. Must be top-level so Pool can pickle it"""
+    return ''.join(transform_words(chunk, func))
+
+def read_chunks(fin, chunk_size: int = 1 << 20, max_carry: int = MAX_WORD) -> Iterator[str]:
+    """Yields chunks of roughly chunk_size characters that never split a word
+
+    Since a word is only letters, every chunk ends on a non-letter and any
+    letters after it are carried over to the next chunk. To keep memory
+    bounded, a run of more than max_carry letters raises ValueError instead
+    of being split into two words
+    """
+    leftover = ''
+    while True:
+        data = fin.read(chunk_size)
+        if not data:
+            break
+        #rstrip only walks back over the letters at the end of the new data
+        head = data.rstrip(ascii_letters)
+        if head:
+            yield leftover + head
+            leftover = data[len(head):]
+        else:
+            #No word boundary in this read, keep carrying letters
+            leftover += data
+        if len(leftover) > max_carry:
+            raise ValueError(f'Found a word longer than {max_carry} letters')
+    if leftover:
+        yield leftover
+
+def translate_file(src: str,
+                   dst: str,
+                   processes: Optional[int] = None,
+                   chunk_size: int = 1 << 20,
+                   max_pending: Optional[int] = None,
+                   func: Callable[[str], str] = pig_latin,
+                   max_carry: int = MAX_WORD) -> int:
+    """Translate src into dst across a process pool. Returns characters read
+
+    func is applied to every word and must be a top-level function so it can
+    be sent to the worker processes. At most max_pending chunks (default:
+    twice the pool size) are in flight at once, so memory use stays bounded
+    no matter how big src is
+
+    chunk_size is only a target. Words are never split between chunks, even
+    when chunk_size is smaller than a word, so the output always matches
+    translate_file_naive. A word longer than max_carry letters raises
+    ValueError instead
+    """
+    processes = processes or cpu_count()
+    max_pending = max_pending or 2 * processes
+    worker = partial(transform_chunk, func=func)
+    total = 0
+    #newline='' keeps the original line endings untouched
+    with open(src, newline='') as fin, \
+         open(dst, 'w', newline='') as fout, \
+         Pool(processes) as pool:
+        #Pool.imap reads its whole input up front, so we manage our own window
+        pending = deque()
+        for chunk in read_chunks(fin, chunk_size, max_carry):
+            total += len(chunk)
+            pending.append(pool.apply_async(worker, (chunk,)))
+            #Results leave the front of the queue in the order they went in
+            if len(pending) >= max_pending:
+                fout.write(pending.popleft().get())
+        while pending:
+            fout.write(pending.popleft().get())
+    return total
+
+def translate_file_naive(src: str, dst: str, func: Callable[[str], str] = pig_latin) -> int:
+    """Translate src into dst one line at a time. Returns characters read"""
+    total = 0
+    with open(src, newline='') as fin, open(dst, 'w', newline='') as fout:
+        for line in fin:
+            total += len(line)
+            fout.write(WORD.sub(lambda m: func(m.group()), line))
+    return total
+
+def benchmark(src: str, dst: str, **kwargs):
+    """Print MB/s for the naive loop and the parallel pipeline
+
+    kwargs are passed on to translate_file
+    """
+    size = os.path.getsize(src)
+    def report(name: str, elapsed: float):
+        print('{:>8}: {:.2f} MB/s ({:.3f} seconds)'.format(name, size / elapsed / 1e6, elapsed))
+
+    start = perf_counter()
+    translate_file_naive(src, dst)
+    report('naive', perf_counter() - start)
+
+    start = perf_counter()
+    translate_file(src, dst, **kwargs)
+    report('parallel', perf_counter() - start)
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 3:
+        print('Usage: pig_latin_stream.py SOURCE DEST [--bench]')
+        sys.exit(1)
+    if '--bench' in sys.argv:
+        benchmark(sys.argv[1], sys.argv[2])
+    else:
+        translate_file(sys.argv[1], sys.argv[2])
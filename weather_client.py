@@ -0,0 +1,256 @@
+"""
+Michael duPont - michael@mdupont.com
+Orlando Python: Beginners Series
+
+A reusable Open Weather client built on the final example in
+syntax_and_data_structures.py. Instead of one blocking request per run, it
+keeps a pooled connection open, caches each city's response for a while,
+and can fetch many cities at once with asyncio
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+#The demo key from syntax_and_data_structures.py
+API_KEY = 'f641b59e03463c808393605f493b1f93'
+BASE_URL = 'http://api.openweathermap.org/data/2.5/weather'
+
+log = logging.getLogger(__name__)
+
+def is_retryable(error: Exception) -> bool:
+    """Only connection problems, timeouts, 429 and 5xx are worth trying again"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+class WeatherClient(object):
+    """Fetches current weather with a connection pool and a per-city TTL cache"""
+
+    def __init__(self,
+                 api_key: str = API_KEY,
+                 base_url: str = BASE_URL,
+                 units: str = 'imperial',
+                 ttl: float = 600.0,
+                 timeout: float = 5.0,
+                 pool_size: int = 10,
+                 retries: int = 3,
+                 backoff: float = 0.5):
+        """Init the client. base_url can point at a local server for testing"""
+        self.api_key = api_key
+        self.base_url = base_url
+        self.units = units
+        self.ttl = ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        #A Session reuses the same sockets between requests instead of
+        #opening a new connection every time
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        #city -> (time fetched, response json)
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+        self._lock = Lock()
+
+    def __enter__(self) -> 'WeatherClient':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+    def _cached(self, city: str) -> Optional[dict]:
+        """Returns the cached response for a city if it hasn't expired"""
+        with self._lock:
+            entry = self._cache.get(city)
+            if entry is None:
+                return None
+            if monotonic() - entry[0] < self.ttl:
+                return entry[1]
+            #Drop stale entries so cities we stop asking about don't pile up
+            del self._cache[city]
+        return None
+
+    def _request(self, city: str) -> dict:
+        """Make one request for a city's weather, bypassing the cache"""
+        params = {'q': city, 'units': self.units, 'appid': self.api_key}
+        r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json()
+        #Don't cache a response we can't use
+        try:
+            data['main']['temp']
+        except (KeyError, TypeError):
+            raise ValueError(f'No temperature in the response for {city}')
+        return data
+
+    def weather(self, city: str) -> dict:
+        """Returns the weather json for a city, using the cache when fresh"""
+        data = self._cached(city)
+        if data is None:
+            data = self._request(city)
+            with self._lock:
+                self._cache[city] = (monotonic(), data)
+        return data
+
+    def temperature(self, city: str) -> float:
+        """Returns the current temperature for a city"""
+        return self.weather(city)['main']['temp']
+
+    async def _fetch(self, city: str, executor: ThreadPoolExecutor) -> Optional[float]:
+        """Fetch one city's temperature in a worker thread
+
+        Retryable errors are tried again with backoff. Anything else, or
+        running out of retries, is logged and the city's result is None
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                data = await loop.run_in_executor(executor, self.weather, city)
+                return data['main']['temp']
+            except (requests.RequestException, ValueError) as error:
+                if attempt == self.retries or not is_retryable(error):
+                    log.warning('Could not fetch weather for %s: %s', city, error)
+                    return None
+            #Wait longer after each failure: 0.5s, 1s, 2s, ...
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def fetch_many(self,
+                         cities: Iterable[str],
+                         concurrency: Optional[int] = None
+                         ) -> Dict[str, Optional[float]]:
+        """Returns {city: temperature} for many cities at once
+
+        At most 'concurrency' requests run at the same time. It defaults to
+        and can't go above the pool size, so every request gets a pooled
+        connection. Cities that fail map to None. Raises ValueError if
+        concurrency is less than 1
+        """
+        cities = list(dict.fromkeys(cities))
+        if concurrency is None:
+            limit = self.pool_size
+        elif concurrency < 1:
+            raise ValueError(f'concurrency must be at least 1, not {concurrency}')
+        else:
+            limit = min(concurrency, self.pool_size)
+        #Our own executor so the limit isn't capped by asyncio's default one
+        with ThreadPoolExecutor(max_workers=limit) as executor:
+            temps = await asyncio.gather(*[self._fetch(city, executor) for city in cities])
+        return dict(zip(cities, temps))
+
+    def temperatures(self,
+                     cities: Iterable[str],
+                     concurrency: Optional[int] = None
+                     ) -> Dict[str, Optional[float]]:
+        """Blocking wrapper around fetch_many"""
+        return asyncio.run(self.fetch_many(cities, concurrency))
+
+def self_test():
+    """Check the cache, retries and concurrency limit against a local server"""
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from threading import Thread
+    from time import sleep
+    from urllib.parse import parse_qs, urlparse
+
+    hits = {}
+    in_flight = [0, 0]  #[current, highest seen]
+    lock = Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        """Pretends to be Open Weather. A few city names trigger errors"""
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            city = parse_qs(urlparse(self.path).query)['q'][0]
+            with lock:
+                hits[city] = hits.get(city, 0) + 1
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            if city == 'missing':
+                status, body = 404, {'message': 'city not found'}
+            elif city == 'flaky' and hits[city] < 3:
+                status, body = 503, {}
+            elif city == 'broken':
+                status, body = 200, {}
+            else:
+                status, body = 200, {'main': {'temp': len(city)}}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/'
+    try:
+        with WeatherClient(base_url=url, ttl=0.2, pool_size=8, backoff=0.01) as client:
+            #Cache: a second call within the TTL doesn't hit the server
+            client.temperature('Orlando')
+            client.temperature('Orlando')
+            assert hits['Orlando'] == 1
+            sleep(0.25)
+            client.temperature('Orlando')
+            assert hits['Orlando'] == 2
+
+            #Retries: 5xx is retried, 404 and bad payloads fail fast
+            temps = client.temperatures(['flaky', 'missing', 'broken'])
+            assert temps == {'flaky': 5, 'missing': None, 'broken': None}
+            assert hits == {'Orlando': 2, 'flaky': 3, 'missing': 1, 'broken': 1}
+
+            #Concurrency: never more than the limit, which is capped at pool_size
+            cities = [f'city{i}' for i in range(40)]
+            in_flight[1] = 0
+            assert len(client.temperatures(cities[:20], concurrency=4)) == 20
+            assert 1 < in_flight[1] <= 4, in_flight
+            in_flight[1] = 0
+            assert len(client.temperatures(cities[20:], concurrency=40)) == 20
+            assert 1 < in_flight[1] <= 8, in_flight
+
+            #Bad limits are rejected up front
+            for bad in (0, -1):
+                try:
+                    client.temperatures(cities, concurrency=bad)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f'concurrency={bad} was accepted')
+
+            #Expired entries are removed, not just replaced
+            sleep(0.25)
+            assert client._cached('Orlando') is None
+            assert 'Orlando' not in client._cache
+    finally:
+        server.shutdown()
+    print('All checks passed')
+
+if __name__ == '__main__':
+    import sys
+    if '--selftest' in sys.argv:
+        self_test()
+    else:
+        with WeatherClient() as client:
+            for city, temp in client.temperatures(sys.argv[1:] or ['Orlando,fl']).items():
+                print(f'The temperature in {city} is', temp)